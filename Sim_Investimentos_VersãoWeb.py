@@ -1,12 +1,20 @@
 import streamlit as st
 import pandas as pd
-import matplotlib.pyplot as plt
 import numpy as np
-import requests
 from datetime import datetime
+from functools import lru_cache, cached_property
+from dataclasses import dataclass
 import json
+from urllib.request import urlopen
+from http.client import HTTPException
+import re
+
+# Troca os separadores do padrão americano (1,234.56) pelos do brasileiro (1.234,56)
+_BRL_TRANS = str.maketrans({',': '.', '.': ','})
 
 # Define uma função de formatação de moeda para o padrão brasileiro
+# (com cache, pois os mesmos valores se repetem muito nas tabelas, como zeros e parcelas fixas)
+@lru_cache(maxsize=4096)
 def format_brl(val):
     """
     Formata um valor numérico para a moeda brasileira (R$).
@@ -15,8 +23,28 @@ def format_brl(val):
     if pd.isna(val):
         return '-'
     # Garante que o valor seja float antes de formatar
-    val = float(val)
-    return f"R$ {val:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+    return "R$ " + f"{float(val):,.2f}".translate(_BRL_TRANS)
+
+def format_brl_series(serie):
+    """
+    Versão de `format_brl` para uma Series inteira.
+    Cada valor distinto passa uma única vez por `format_brl` (zeros e parcelas fixas
+    se repetem muito nas tabelas) e valores ausentes viram '-' sem checar célula por célula.
+    """
+    codigos, unicos = pd.factorize(serie.to_numpy(dtype=float, na_value=np.nan))
+    # O código -1 (valor ausente) cai na última posição, reservada para '-'
+    textos = np.array([format_brl(val) for val in unicos.tolist()] + ['-'], dtype=object)
+    return pd.Series(textos[codigos], index=serie.index)
+
+def formatar_brl_df(df, colunas=None):
+    """
+    Retorna uma cópia do DataFrame com as colunas monetárias já convertidas em texto
+    no padrão R$, para exibir com st.dataframe sem passar pelo Styler.
+    Se `colunas` não for informado, todas as colunas são formatadas.
+    """
+    if colunas is None:
+        colunas = df.columns
+    return df.assign(**{col: format_brl_series(df[col]) for col in colunas})
 
 # -------------------------------------------------------------
 # Requisitos da Professora
@@ -35,47 +63,71 @@ def format_brl(val):
 # Funções de Dados e Cálculo
 # -----------------------------
 
-def get_selic():
-    """Busca a taxa Selic no Banco Central. Retorna (taxa, data) e 13% como fallback."""
+@st.cache_data(ttl=3600, show_spinner=False)
+def _fetch_selic():
+    """
+    Busca a taxa Selic no Banco Central e retorna (taxa, data).
+    Erros de rede ou de resposta são propagados, para que só consultas bem-sucedidas
+    fiquem em cache.
+    """
     url = "https://api.bcb.gov.br/dados/serie/bcdata.sgs.432/dados/ultimos/1?formato=json"
-    try:
-        response = requests.get(url).json()
-        selic = float(response[0]['valor']) / 100
-        data = response[0]['data']
-        # Converte a data para o formato brasileiro
-        data_obj = datetime.strptime(data, '%d/%m/%Y').date()
-        hoje = datetime.now().date()
-
-        # Se a data da API for futura, usa a data atual
-        if data_obj > hoje:
-            data_para_exibir = hoje
-        else:
-            data_para_exibir = data_obj
+    with urlopen(url, timeout=5) as resposta_http:
+        response = json.load(resposta_http)
+    selic = float(response[0]['valor']) / 100
+    data = response[0]['data']
+    # Converte a data para o formato brasileiro
+    data_obj = datetime.strptime(data, '%d/%m/%Y').date()
+    hoje = datetime.now().date()
+
+    # Se a data da API for futura, usa a data atual
+    if data_obj > hoje:
+        data_para_exibir = hoje
+    else:
+        data_para_exibir = data_obj
+
+    # Formata a data para DD/MM/YYYY
+    data_formatada = data_para_exibir.strftime('%d/%m/%Y')
 
-        # Formata a data para DD/MM/YYYY
-        data_formatada = data_para_exibir.strftime('%d/%m/%Y')
+    return selic, data_formatada
 
-        return selic, data_formatada
-    except:
+def get_selic():
+    """Retorna (taxa, data) da Selic; se a consulta falhar, usa 13% como fallback sem guardá-lo em cache."""
+    # HTTPException cobre respostas truncadas ou malformadas, que o urlopen não converte em OSError;
+    # TypeError, um JSON com formato inesperado
+    try:
+        return _fetch_selic()
+    except (OSError, HTTPException, KeyError, IndexError, TypeError, ValueError):
         return 0.13, "Data não disponível"
 
-def get_cdi():
-    """Calcula o CDI a partir da Selic. CDI ≈ 99,75% da Selic."""
-    return get_selic()[0] * 0.9975
+def get_cdi(selic_anual):
+    """Calcula o CDI a partir da Selic já obtida. CDI ≈ 99,75% da Selic."""
+    return selic_anual * 0.9975
 
-def get_poupanca():
+def get_poupanca(selic_anual):
     """
-    Calcula a taxa de rendimento anual da poupança com base na Selic.
+    Calcula a taxa de rendimento anual da poupança com base na Selic já obtida.
     - Se Selic > 8.5% a.a., poupança = 0.5% a.m. (aprox. 6.17% a.a.)
     - Se Selic <= 8.5% a.a., poupança = 70% da Selic
     """
-    selic_anual = get_selic()[0]
     if selic_anual > 0.085:
         # 0.5% ao mês, convertendo para anual
         return (1 + 0.005)**12 - 1
     else:
         return selic_anual * 0.70
 
+# Par 'mês:valor' dos aportes customizados (ex: "12:1000, 24:2000.50")
+_CUSTOM_RE = re.compile(r'(\d+)\s*:\s*([-+]?\d+(?:\.\d+)?)')
+
+def _parse_custom_contribs(texto):
+    """
+    Converte o texto dos aportes customizados em um dicionário {mês: valor}.
+    Os pares podem ser separados por vírgula ou ponto e vírgula; qualquer trecho
+    fora do formato 'mês:valor' levanta ValueError.
+    """
+    if _CUSTOM_RE.sub('', texto).strip(' \t\r\n,;'):
+        raise ValueError(f"Formato inválido para aportes customizados: {texto!r}")
+    return {int(mes): float(valor) for mes, valor in _CUSTOM_RE.findall(texto)}
+
 def calcular_ir_regressivo(meses, rendimento):
     """
     Calcula o Imposto de Renda com base na tabela regressiva para renda fixa.
@@ -95,6 +147,26 @@ def calcular_ir_regressivo(meses, rendimento):
         aliquota = 0.15
     return rendimento * aliquota
 
+def _aportes_mensais(tipo_aporte, aporte_mensal_base, variacao_aporte, aportes_customizados, meses):
+    """Monta o array com o aporte de cada mês conforme o tipo de aporte escolhido."""
+    meses_idx = np.arange(1, meses + 1)
+
+    # Lógica para o aporte variável
+    if tipo_aporte == "Variação Linear":
+        return aporte_mensal_base + (meses_idx - 1) * variacao_aporte
+    elif tipo_aporte == "Variação Percentual":
+        # Calcula o aporte com base no crescimento anual
+        return aporte_mensal_base * (1 + variacao_aporte) ** ((meses_idx - 1) // 12)
+    elif tipo_aporte == "Aportes Customizados":
+        aportes = np.full(meses, aporte_mensal_base, dtype=float)
+        # Soma os aportes adicionais direto no array; meses fora do período são ignorados
+        for mes, valor in aportes_customizados.items():
+            if 1 <= mes <= meses:
+                aportes[mes - 1] += valor
+        return aportes
+    else: # Fixo ou tipo inválido (assume fixo)
+        return np.full(meses, aporte_mensal_base, dtype=float)
+
 def simular_investimento_detalhado(
     valor_inicial,
     tipo_aporte,
@@ -111,54 +183,35 @@ def simular_investimento_detalhado(
     - Suporta diferentes tipos de aportes variáveis e taxas variáveis.
     - Calcula o IR regressivo.
     """
-    dados_mensais = []
-    saldo = valor_inicial
-    capital_total = valor_inicial
+    meses_idx = np.arange(1, meses + 1)
 
-    # A taxa mensal é calculada a partir da taxa anual base
+    aportes = _aportes_mensais(tipo_aporte, aporte_mensal_base, variacao_aporte, aportes_customizados, meses)
+
+    # A taxa mensal é calculada a partir da taxa anual base e varia a cada mês
     taxa_mensal = (1 + taxa_anual_base) ** (1/12) - 1
+    taxas = taxa_mensal * (1 + variacao_taxa_mensal) ** np.arange(meses)
 
-    for mes in range(1, meses + 1):
-        # Lógica para o aporte variável
-        if tipo_aporte == "Fixo":
-            aporte_do_mes = aporte_mensal_base
-        elif tipo_aporte == "Variação Linear":
-            aporte_do_mes = aporte_mensal_base + (mes - 1) * variacao_aporte
-        elif tipo_aporte == "Variação Percentual":
-            # Calcula o aporte com base no crescimento anual
-            aporte_do_mes = aporte_mensal_base * (1 + variacao_aporte)**((mes - 1) // 12)
-        elif tipo_aporte == "Aportes Customizados":
-            aporte_do_mes = aporte_mensal_base + aportes_customizados.get(mes, 0)
-        else: # Tipo inválido, assume fixo
-            aporte_do_mes = aporte_mensal_base
-
-        # Juros do mês com taxa variável
-        juros_do_mes = saldo * taxa_mensal
-
-        # Saldo bruto atualizado
-        saldo += juros_do_mes + aporte_do_mes
-        capital_total += aporte_do_mes
-
-        # Variação da taxa para o próximo mês
-        taxa_mensal *= (1 + variacao_taxa_mensal)
-
-        # Guarda os dados para o DataFrame
-        dados_mensais.append({
-            'Mês': mes,
-            'Aporte': aporte_do_mes,
-            'Juros (R$)': juros_do_mes,
-            'Saldo Bruto (R$)': saldo,
-            'Capital Acumulado (R$)': capital_total
-        })
+    # Forma fechada da recorrência saldo = saldo * (1 + taxa) + aporte
+    fatores = np.cumprod(1 + taxas)
+    saldos = fatores * (valor_inicial + np.cumsum(aportes / fatores))
+    saldos_anteriores = np.concatenate(([valor_inicial], saldos[:-1]))
+    juros = saldos_anteriores * taxas
+    capital = valor_inicial + np.cumsum(aportes)
 
     # Cria o DataFrame
-    df_detalhado = pd.DataFrame(dados_mensais)
+    df_detalhado = pd.DataFrame({
+        'Mês': meses_idx,
+        'Aporte': aportes,
+        'Juros (R$)': juros,
+        'Saldo Bruto (R$)': saldos,
+        'Capital Acumulado (R$)': capital
+    })
 
-    # Cálculos finais
-    saldo_bruto = df_detalhado.loc[meses - 1, 'Saldo Bruto (R$)']
+    # Cálculos finais, lidos diretamente dos arrays
+    saldo_bruto = saldos[-1]
 
     # Calcula o capital investido de forma mais precisa
-    capital_investido = valor_inicial + df_detalhado['Aporte'].sum()
+    capital_investido = valor_inicial + aportes.sum()
     rendimento_bruto = saldo_bruto - capital_investido
 
     ir_pago = 0.0
@@ -169,113 +222,227 @@ def simular_investimento_detalhado(
 
     return saldo_bruto, ir_pago, saldo_liquido, df_detalhado, capital_investido
 
+def simular_investimentos_comparativos(
+    valor_inicial,
+    tipo_aporte,
+    aporte_mensal_base,
+    variacao_aporte,
+    aportes_customizados,
+    taxas_anuais,
+    incide_ir,
+    meses
+):
+    """
+    Simula de uma só vez vários investimentos com os mesmos aportes, um por taxa anual.
+    - `taxas_anuais` e `incide_ir` têm uma posição por investimento.
+    - Retorna a matriz de saldos brutos (investimentos x meses), os saldos finais,
+      o IR pago e o capital investido.
+    """
+    aportes = _aportes_mensais(tipo_aporte, aporte_mensal_base, variacao_aporte, aportes_customizados, meses)
+
+    # Uma linha por investimento; as taxas são fixas ao longo do período
+    taxas_mensais = (1 + np.asarray(taxas_anuais, dtype=float)) ** (1/12) - 1
+    fatores = np.cumprod(np.broadcast_to(1 + taxas_mensais[:, None], (len(taxas_mensais), meses)), axis=1)
+    saldos = fatores * (valor_inicial + np.cumsum(aportes / fatores, axis=1))
+
+    saldo_bruto = saldos[:, -1]
+    capital_investido = valor_inicial + aportes.sum()
+    rendimento_bruto = saldo_bruto - capital_investido
+
+    # O IR só é descontado dos investimentos marcados em `incide_ir`
+    ir_pago = np.where(incide_ir, calcular_ir_regressivo(meses, rendimento_bruto), 0.0)
+
+    saldo_liquido = saldo_bruto - ir_pago
+
+    return saldos, saldo_bruto, ir_pago, saldo_liquido, capital_investido
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def rodar_analise_comparativa(
+    valor_inicial,
+    tipo_aporte,
+    aporte_mensal_base,
+    variacao_aporte,
+    aportes_customizados,
+    taxas,
+    meses
+):
+    """
+    Executa a análise comparativa da Aba 1, com cache por combinação de entradas.
+    - `aportes_customizados` é uma tupla de pares (mês, valor) e `taxas` uma tupla de
+      pares (nome, taxa anual), para que os argumentos sejam hasheáveis.
+    - Retorna o dicionário de resultados por investimento, o DataFrame do gráfico de
+      saldos e o capital investido.
+    """
+    nomes = [nome for nome, _ in taxas]
+    incide_ir = np.array([nome.startswith("CDB") or nome.startswith("Tesouro") for nome in nomes])
+
+    # Simula os investimentos em uma única passada vetorizada
+    saldos, saldo_bruto, ir_pago, saldo_liquido, capital_investido = simular_investimentos_comparativos(
+        valor_inicial,
+        tipo_aporte,
+        aporte_mensal_base,
+        variacao_aporte,
+        dict(aportes_customizados),
+        [taxa for _, taxa in taxas],
+        incide_ir,
+        meses
+    )
+
+    resultados = {}
+    for i, nome in enumerate(nomes):
+        resultados[nome] = {
+            "Saldo Final Bruto (R$)": saldo_bruto[i],
+            "IR Pago (R$)": ir_pago[i],
+            "Saldo Final Líquido (R$)": saldo_liquido[i]
+        }
+
+    # DataFrame para o gráfico de linhas com os saldos de cada investimento
+    df_grafico_linhas = pd.DataFrame(saldos.T, index=pd.RangeIndex(1, meses + 1, name='Mês'), columns=nomes)
+
+    return resultados, df_grafico_linhas, capital_investido
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def _parse_extra_months(texto):
+    """
+    Converte o texto com os meses de amortização extraordinária (ex: "12, 24, 36")
+    em uma tupla de meses. Retorna (meses, mensagem de erro), com a mensagem None
+    quando o texto é válido ou vazio.
+    """
+    if not texto:
+        return (), None
+    try:
+        return tuple(int(m.strip()) for m in texto.split(',')), None
+    except ValueError:
+        return (), "Por favor, insira os meses de amortização separados por vírgula (ex: 12, 24, 36)."
+
+# Saldos abaixo de meio centavo (em módulo) são só resíduo de arredondamento: contam como zero
+_TOLERANCIA_SALDO = 0.005
+
+def _extras_por_mes(meses_extra_amort, meses, amort_extra_valor):
+    """
+    Converte a lista de meses com amortização extraordinária em um array denso com o
+    valor extra de cada mês (posição 0 = mês 1). Meses fora do prazo são ignorados.
+    """
+    idx = np.asarray(meses_extra_amort, dtype=np.int64) - 1
+    idx = idx[(idx >= 0) & (idx < meses)]
+    extras = np.zeros(meses)
+    extras[idx] = amort_extra_valor
+    return extras
+
+def _tabela_amortizacao(colunas):
+    """
+    Monta o DataFrame de amortização a partir do array (4, meses) com juros, amortização,
+    parcela e saldo devedor. As quatro colunas viram um único bloco float64 que aponta
+    para o próprio array (sem cópia); só a coluna 'Mês' é criada à parte.
+    """
+    tabela = pd.DataFrame(colunas.T, columns=['Juros', 'Amortização', 'Parcela', 'Saldo Devedor'], copy=False)
+    tabela.insert(0, 'Mês', np.arange(1, colunas.shape[1] + 1))
+    return tabela
+
+@dataclass
+class SimResult:
+    """
+    Resultado de uma simulação de amortização: os totais já calculados e o array
+    (4, meses) com as colunas da tabela (juros, amortização, parcela, saldo devedor).
+    O DataFrame só é montado no primeiro acesso a `df`.
+    """
+    juros_total: float
+    parcela_total: float
+    _colunas: np.ndarray
+
+    @cached_property
+    def df(self):
+        return _tabela_amortizacao(self._colunas)
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def derive_params(taxa_anual, principal_total, entrada):
+    """Converte os campos do formulário em (taxa mensal equivalente, valor financiado)."""
+    return (1 + taxa_anual)**(1/12) - 1, principal_total - entrada
+
+def _parcela_price(principal, taxa_mensal, meses):
+    """Parcela fixa da Tabela Price; com taxa zero, usa o limite da fórmula."""
+    if taxa_mensal != 0:
+        fator_prazo = (1 + taxa_mensal)**meses
+        return principal * fator_prazo * taxa_mensal / (fator_prazo - 1)
+    return principal / meses
+
+# cache_resource guarda o próprio SimResult (sem serializar), então o DataFrame montado
+# no primeiro acesso a `df` é reaproveitado enquanto as entradas não mudarem
+@st.cache_resource(show_spinner=False, max_entries=64)
 def calcular_sac(principal, taxa_mensal, meses, amort_extra_valor, meses_extra_amort):
     """Calcula a tabela de amortização SAC com amortização extraordinária."""
-    tabela = []
-    saldo_devedor = principal
-    juros_total = 0
-    parcela_total = 0
+    extras = _extras_por_mes(meses_extra_amort, meses, amort_extra_valor)
+
+    # Amortização constante acrescida das amortizações extraordinárias de cada mês
     amortizacao_fixa = principal / meses
+    amortizacao = amortizacao_fixa + extras
 
-    for mes in range(1, meses + 1):
-        if saldo_devedor <= 0:
-            # Se o saldo devedor já foi pago, todas as colunas são zero
-            tabela.append({
-                'Mês': mes,
-                'Juros': 0,
-                'Amortização': 0,
-                'Parcela': 0,
-                'Saldo Devedor': 0
-            })
-            continue
+    # Saldo após cada mês: a parte constante em forma fechada e só os extras acumulados
+    saldo_devedor = principal - amortizacao_fixa * np.arange(1, meses + 1) - np.cumsum(extras)
+    saldo_devedor[np.abs(saldo_devedor) < _TOLERANCIA_SALDO] = 0.0
+    saldo_anterior = np.concatenate(([principal], saldo_devedor[:-1]))
+    juros = saldo_anterior * taxa_mensal
 
-        juros = saldo_devedor * taxa_mensal
+    # Meses até a quitação (inclusive); só eles entram na tabela
+    n_ativos = np.logical_and.accumulate(saldo_anterior > 0).sum()
+    juros, amortizacao, saldo_devedor = juros[:n_ativos], amortizacao[:n_ativos], saldo_devedor[:n_ativos]
 
-        amortizacao_mes = amortizacao_fixa
+    # Garante que o saldo devedor não seja negativo no mês da quitação; com os resíduos
+    # já zerados acima, isso só ocorre quando uma amortização extraordinária ultrapassa o saldo
+    if n_ativos and saldo_devedor[-1] < 0:
+        amortizacao[-1] = saldo_anterior[n_ativos - 1] - extras[n_ativos - 1] + juros[-1]
+        saldo_devedor[-1] = 0.0
 
-        # Adiciona amortização extraordinária se o mês estiver na lista
-        if mes in meses_extra_amort:
-            amortizacao_mes += amort_extra_valor
+    # Uma linha contígua por coluna da tabela; após a quitação, todas ficam zeradas
+    colunas = np.zeros((4, meses))
+    colunas[:, :n_ativos] = juros, amortizacao, amortizacao + juros, saldo_devedor
+    juros, amortizacao, parcela, saldo_devedor = colunas
 
-        parcela = amortizacao_mes + juros
+    return SimResult(juros.sum(), parcela.sum(), colunas)
 
-        saldo_devedor_anterior = saldo_devedor
-        saldo_devedor -= amortizacao_mes
+@st.cache_resource(show_spinner=False, max_entries=64)
+def calcular_price(principal, taxa_mensal, meses, amort_extra_valor, meses_extra_amort):
+    """Calcula a tabela de amortização Tabela Price com amortização extraordinária."""
+    extras = _extras_por_mes(meses_extra_amort, meses, amort_extra_valor)
 
-        # Garante que o saldo devedor não seja negativo
-        if saldo_devedor < 0:
-            amortizacao_mes = saldo_devedor_anterior - (amort_extra_valor if mes in meses_extra_amort else 0)
-            amortizacao_mes += juros
-            saldo_devedor = 0
-            parcela = amortizacao_mes + juros
+    meses_idx = np.arange(1, meses + 1)
+    fatores = (1 + taxa_mensal) ** meses_idx
 
-        juros_total += juros
-        parcela_total += parcela
+    # Saldo pela fórmula fechada da anuidade; com taxa zero, usa o limite da fórmula.
+    # A forma P * (f_n - f_k) / (f_n - 1) evita subtrair dois termos da ordem de P * f_k,
+    # que perdem precisão em prazos longos com taxas altas
+    parcela_fixa = _parcela_price(principal, taxa_mensal, meses)
+    if taxa_mensal != 0:
+        saldo_devedor = principal * (fatores[-1] - fatores) / (fatores[-1] - 1)
+    else:
+        saldo_devedor = principal - parcela_fixa * meses_idx
 
-        tabela.append({
-            'Mês': mes,
-            'Juros': juros,
-            'Amortização': amortizacao_mes,
-            'Parcela': parcela,
-            'Saldo Devedor': saldo_devedor
-        })
+    # Cada amortização extraordinária abate o saldo, corrigida pelos juros dos meses seguintes
+    saldo_devedor -= fatores * np.cumsum(extras / fatores)
+    saldo_devedor[np.abs(saldo_devedor) < _TOLERANCIA_SALDO] = 0.0
+    saldo_anterior = np.concatenate(([principal], saldo_devedor[:-1]))
+    juros = saldo_anterior * taxa_mensal
+    amortizacao = parcela_fixa - juros
 
-    return pd.DataFrame(tabela), juros_total, parcela_total
+    # Meses até a quitação (inclusive); só eles entram na tabela
+    n_ativos = np.logical_and.accumulate(saldo_anterior > 0).sum()
+    juros, amortizacao, saldo_devedor = juros[:n_ativos], amortizacao[:n_ativos], saldo_devedor[:n_ativos]
 
-def calcular_price(principal, taxa_mensal, meses, amort_extra_valor, meses_extra_amort):
-    """Calcula a tabela de amortização Tabela Price com amortização extraordinária."""
-    tabela = []
-    saldo_devedor = principal
-    juros_total = 0
-    parcela_total = 0
+    # Garante que o saldo devedor não seja negativo no mês da quitação; com os resíduos
+    # já zerados acima, isso só ocorre quando uma amortização extraordinária ultrapassa o saldo
+    if n_ativos and saldo_devedor[-1] < 0:
+        amortizacao[-1] = saldo_anterior[n_ativos - 1] - extras[n_ativos - 1] + juros[-1]
+        saldo_devedor[-1] = 0.0
 
-    # Cálculo da parcela fixa
-    try:
-        parcela_fixa = principal * ((1 + taxa_mensal)**meses * taxa_mensal) / ((1 + taxa_mensal)**meses - 1)
-    except ZeroDivisionError:
-        parcela_fixa = 0
-
-    for mes in range(1, meses + 1):
-        if saldo_devedor <= 0:
-            # Se o saldo devedor já foi pago, todas as colunas são zero
-            tabela.append({
-                'Mês': mes,
-                'Juros': 0,
-                'Amortização': 0,
-                'Parcela': 0,
-                'Saldo Devedor': 0
-            })
-            continue
-
-        juros = saldo_devedor * taxa_mensal
-        amortizacao = parcela_fixa - juros
-
-        saldo_devedor_anterior = saldo_devedor
-
-        # Adiciona amortização extraordinária se o mês estiver na lista
-        if mes in meses_extra_amort:
-            saldo_devedor -= amort_extra_valor
-
-        saldo_devedor -= amortizacao
-
-        # Garante que o saldo devedor não seja negativo
-        if saldo_devedor < 0:
-            amortizacao = saldo_devedor_anterior - (amort_extra_valor if mes in meses_extra_amort else 0)
-            amortizacao += juros
-            saldo_devedor = 0
-
-        juros_total += juros
-        parcela_total += (parcela_fixa + (amort_extra_valor if mes in meses_extra_amort else 0))
-
-        tabela.append({
-            'Mês': mes,
-            'Juros': juros,
-            'Amortização': amortizacao,
-            'Parcela': parcela_fixa,
-            'Saldo Devedor': saldo_devedor
-        })
-
-    return pd.DataFrame(tabela), juros_total, parcela_total
+    # Uma linha contígua por coluna da tabela; após a quitação, todas ficam zeradas
+    colunas = np.zeros((4, meses))
+    colunas[:, :n_ativos] = juros, amortizacao, np.full(n_ativos, parcela_fixa), saldo_devedor
+    juros, amortizacao, parcela, saldo_devedor = colunas
+
+    # O total pago inclui as amortizações extraordinárias dos meses até a quitação
+    parcela_total = parcela.sum() + extras[:n_ativos].sum()
+
+    return SimResult(juros.sum(), parcela_total, colunas)
 
 # -----------------------------
 # Configuração Streamlit
@@ -305,8 +472,8 @@ if aba == "Análise Comparativa (com Taxas de Juros Atuais)":
 
     # Busca as taxas de juros atuais e a data da coleta
     selic, selic_data = get_selic()
-    cdi = get_cdi()
-    poupanca_taxa = get_poupanca()
+    cdi = get_cdi(selic)
+    poupanca_taxa = get_poupanca(selic)
 
     # Mostra as taxas de juros que estão sendo aplicadas
     st.info(f"**Taxas de Juros Atuais (Informações do Banco Central do Brasil):**\n\n"
@@ -369,14 +536,8 @@ if aba == "Análise Comparativa (com Taxas de Juros Atuais)":
                 help="Preencha com o mês e o valor, separados por vírgula. Ex: `12:1000, 24:2000, 36:500`"
             )
             try:
-                if aportes_customizados_str:
-                    limpo_str = aportes_customizados_str.replace(';', ',')
-                    for item in limpo_str.split(','):
-                        item_strip = item.strip()
-                        if item_strip:
-                            mes, valor = item_strip.split(':')
-                            aportes_customizados_comp[int(mes.strip())] = float(valor.strip())
-            except:
+                aportes_customizados_comp = _parse_custom_contribs(aportes_customizados_str)
+            except ValueError:
                 st.error("Formato inválido para aportes customizados. Use 'mês:valor' separado por vírgula.")
                 aportes_customizados_comp = {}
 
@@ -393,37 +554,23 @@ if aba == "Análise Comparativa (com Taxas de Juros Atuais)":
             "Tesouro Selic": selic,
         }
 
-        resultados = {}
-        dataframes_para_grafico = {}
-        for nome, taxa_anual in taxas.items():
-            incide_ir = nome.startswith("CDB") or nome.startswith("Tesouro")
-            # Usa a nova função de simulação para a precisão do IR e capital investido
-            saldo_bruto, ir_pago, saldo_liquido, df_detalhado, capital_investido = simular_investimento_detalhado(
-                valor_inicial,
-                tipo_aporte_comp,
-                aporte_comp,
-                variacao_aporte_comp,
-                aportes_customizados_comp,
-                taxa_anual,
-                0, # Taxa fixa para comparação
-                meses,
-                incide_ir
-            )
-            resultados[nome] = {
-                "Saldo Final Bruto (R$)": saldo_bruto,
-                "IR Pago (R$)": ir_pago,
-                "Saldo Final Líquido (R$)": saldo_liquido
-            }
-            dataframes_para_grafico[nome] = df_detalhado.set_index('Mês')
-
+        resultados, df_grafico_linhas, capital_investido = rodar_analise_comparativa(
+            valor_inicial,
+            tipo_aporte_comp,
+            aporte_comp,
+            variacao_aporte_comp,
+            tuple(sorted(aportes_customizados_comp.items())),
+            tuple(taxas.items()),
+            meses
+        )
 
         st.info(f"**Total Investido (Capital Alocado):** {format_brl(capital_investido)}")
 
-        df_comp = pd.DataFrame(resultados).T
+        df_comp = pd.DataFrame.from_dict(resultados, orient='index')
         st.subheader("Resultados Comparativos")
 
         # Formata os valores da tabela
-        st.dataframe(df_comp.style.format(format_brl))
+        st.dataframe(formatar_brl_df(df_comp))
 
         # Análise textual
         melhor = df_comp["Saldo Final Líquido (R$)"].idxmax()
@@ -455,11 +602,6 @@ if aba == "Análise Comparativa (com Taxas de Juros Atuais)":
         st.markdown("---")
         st.subheader("Análise Gráfica")
 
-        # Cria um DataFrame para o gráfico de linhas com os saldos de cada investimento
-        df_grafico_linhas = pd.DataFrame({
-            nome: df['Saldo Bruto (R$)'] for nome, df in dataframes_para_grafico.items()
-        })
-
         st.line_chart(df_grafico_linhas)
         st.bar_chart(df_comp['Saldo Final Líquido (R$)'])
         st.markdown("---")
@@ -504,17 +646,9 @@ elif aba == "Simulação Manual Detalhada":
                     "Aportes adicionais (mês:valor)",
                     help="Preencha com o mês e o valor, separados por vírgula. Ex: `12:1000, 24:2000, 36:500`"
                 )
-                aportes_customizados = {}
                 try:
-                    if aportes_customizados_str:
-                        # Substitui ponto e vírgula por vírgula para maior flexibilidade
-                        limpo_str = aportes_customizados_str.replace(';', ',')
-                        for item in limpo_str.split(','):
-                            item_strip = item.strip()
-                            if item_strip:
-                                mes, valor = item_strip.split(':')
-                                aportes_customizados[int(mes.strip())] = float(valor.strip())
-                except:
+                    aportes_customizados = _parse_custom_contribs(aportes_customizados_str)
+                except ValueError:
                     st.error("Formato inválido para aportes customizados. Use 'mês:valor' separado por vírgula.")
                     aportes_customizados = {}
             else:
@@ -597,15 +731,8 @@ elif aba == "Simulação Manual Detalhada":
             st.markdown("---")
             st.subheader("Visualização do Crescimento")
 
-            fig, ax = plt.subplots(figsize=(10, 6))
-            ax.plot(df_detalhado['Mês'], df_detalhado['Saldo Bruto (R$)'], label='Saldo Bruto')
-            ax.plot(df_detalhado['Mês'], df_detalhado['Capital Acumulado (R$)'], label='Capital Acumulado')
-            ax.set_title('Crescimento do Investimento ao Longo do Tempo')
-            ax.set_xlabel('Mês')
-            ax.set_ylabel('Valor (R$)')
-            ax.grid(True)
-            ax.legend()
-            st.pyplot(fig)
+            # Gráfico renderizado no navegador (Vega-Lite), sem gerar imagem no servidor
+            st.line_chart(df_detalhado.set_index('Mês')[['Saldo Bruto (R$)', 'Capital Acumulado (R$)']])
 
         else:
             st.error("O período de simulação deve ser maior que 0. Por favor, insira anos ou meses para continuar.")
@@ -682,101 +809,99 @@ elif aba == "SAC x Tabela Price":
     st.header("Análise Comparativa: SAC vs. Tabela Price")
     st.markdown("Compare a diferença entre os sistemas de amortização para o seu financiamento.")
 
-    with st.expander("Configurar o Financiamento"):
-        col_price1, col_price2 = st.columns(2)
-        with col_price1:
-            principal_total = st.number_input("Valor do Imóvel/Bem (R$)", min_value=1000.0, step=1000.0, key="vlr_bem", help="Valor total do bem que você deseja financiar.")
-        with col_price2:
-            entrada = st.number_input("Valor de Entrada (R$)", min_value=0.0, step=1000.0, key="vlr_entrada", help="Valor pago à vista, que será subtraído do valor total.")
+    # Os campos ficam num formulário: editar um valor não reroda o app, só o envio
+    with st.form("sim_form"):
+        with st.expander("Configurar o Financiamento"):
+            col_price1, col_price2, col_price3, col_price4 = st.columns(4)
+            with col_price1:
+                principal_total = st.number_input("Valor do Imóvel/Bem (R$)", min_value=1000.0, step=1000.0, key="vlr_bem", help="Valor total do bem que você deseja financiar.")
+            with col_price2:
+                entrada = st.number_input("Valor de Entrada (R$)", min_value=0.0, step=1000.0, key="vlr_entrada", help="Valor pago à vista, que será subtraído do valor total.")
+            with col_price3:
+                taxa_anual = st.number_input("Taxa de Juros Anual (%)", min_value=0.1, step=0.1, key="price_taxa", help="Taxa anual do seu financiamento.") / 100
+            with col_price4:
+                meses_totais = st.number_input("Período (meses)", min_value=12, step=12, key="price_meses", help="Duração total do seu financiamento em meses.")
 
-        col_price3, col_price4 = st.columns(2)
-        with col_price3:
-            taxa_anual = st.number_input("Taxa de Juros Anual (%)", min_value=0.1, step=0.1, key="price_taxa", help="Taxa anual do seu financiamento.") / 100
-        with col_price4:
-            meses_totais = st.number_input("Período (meses)", min_value=12, step=12, key="price_meses", help="Duração total do seu financiamento em meses.")
+        st.markdown("---")
 
-    st.markdown("---")
+        with st.expander("Configurar Amortizações Extraordinárias (Opcional)"):
+            st.info("Use este campo para simular pagamentos extras que abatem o saldo devedor.")
+            col_amort1, col_amort2 = st.columns(2)
+            with col_amort1:
+                amortizacao_extra_valor = st.number_input("Valor da Amortização Extraordinária (R$)", min_value=0.0, step=100.0, key="amort_valor", help="Valor que você deseja pagar extra.")
+            with col_amort2:
+                amortizacao_extra_meses_str = st.text_input("Meses para as amortizações (ex: 12, 24, 36)", "", key="amort_meses", help="Liste os meses em que o valor acima será pago, separados por vírgula.")
 
-    with st.expander("Configurar Amortizações Extraordinárias (Opcional)"):
-        st.info("Use este campo para simular pagamentos extras que abatem o saldo devedor.")
-        col_amort1, col_amort2 = st.columns(2)
-        with col_amort1:
-            amortizacao_extra_valor = st.number_input("Valor da Amortização Extraordinária (R$)", min_value=0.0, step=100.0, key="amort_valor", help="Valor que você deseja pagar extra.")
-        with col_amort2:
-            amortizacao_extra_meses_str = st.text_input("Meses para as amortizações (ex: 12, 24, 36)", "", key="amort_meses", help="Liste os meses em que o valor acima será pago, separados por vírgula.")
+        simular = st.form_submit_button("Simular Amortização")
 
     # Processa os meses de amortização
-    meses_extra_amort = []
-    if amortizacao_extra_meses_str:
-        try:
-            meses_extra_amort = [int(m.strip()) for m in amortizacao_extra_meses_str.split(',')]
-        except ValueError:
-            st.error("Por favor, insira os meses de amortização separados por vírgula (ex: 12, 24, 36).")
-            meses_extra_amort = []
+    meses_extra_amort, erro_meses_extra = _parse_extra_months(amortizacao_extra_meses_str)
+    if erro_meses_extra:
+        st.error(erro_meses_extra)
 
 
-    taxa_mensal = (1 + taxa_anual)**(1/12) - 1
+    taxa_mensal, principal_liquido = derive_params(taxa_anual, principal_total, entrada)
 
-    principal_liquido = principal_total - entrada
+    if simular:
 
-    if st.button("Simular Amortização", key="simular_amortizacao_btn"):
-
-        df_sac, juros_sac, parcelas_sac = calcular_sac(principal_liquido, taxa_mensal, meses_totais, amortizacao_extra_valor, meses_extra_amort)
-        df_price, juros_price, parcelas_price = calcular_price(principal_liquido, taxa_mensal, meses_totais, amortizacao_extra_valor, meses_extra_amort)
+        # Os totais saem do mesmo cálculo que as tabelas exibidas abaixo; o DataFrame de
+        # cada sistema só é montado quando `.df` é acessado
+        resultado_sac = calcular_sac(principal_liquido, taxa_mensal, meses_totais, amortizacao_extra_valor, meses_extra_amort)
+        resultado_price = calcular_price(principal_liquido, taxa_mensal, meses_totais, amortizacao_extra_valor, meses_extra_amort)
 
         st.subheader("Resumo dos Custos Totais")
         col_metrics_sac, col_metrics_price = st.columns(2)
 
         with col_metrics_sac:
-            st.metric(label="Total Pago (SAC)", value=format_brl(parcelas_sac))
-            st.metric(label="Juros Totais Pagos (SAC)", value=format_brl(juros_sac))
+            st.metric(label="Total Pago (SAC)", value=format_brl(resultado_sac.parcela_total))
+            st.metric(label="Juros Totais Pagos (SAC)", value=format_brl(resultado_sac.juros_total))
 
         with col_metrics_price:
-            st.metric(label="Total Pago (Tabela Price)", value=format_brl(parcelas_price))
-            st.metric(label="Juros Totais Pagos (Tabela Price)", value=format_brl(juros_price))
+            st.metric(label="Total Pago (Tabela Price)", value=format_brl(resultado_price.parcela_total))
+            st.metric(label="Juros Totais Pagos (Tabela Price)", value=format_brl(resultado_price.juros_total))
 
         st.markdown("---")
         st.subheader("Resultados Detalhados")
 
+        # As tabelas completas só são montadas depois que o resumo já foi exibido
+        with st.spinner("Montando as tabelas de amortização..."):
+            df_sac = resultado_sac.df
+            df_price = resultado_price.df
+
+        # Colunas exibidas em R$ nas duas tabelas
+        colunas_moeda = ['Juros', 'Amortização', 'Parcela', 'Saldo Devedor']
+
         col_sac, col_price = st.columns(2)
         with col_sac:
             st.subheader("Tabela SAC")
-            st.dataframe(df_sac.style.format({
-                'Juros': format_brl,
-                'Amortização': format_brl,
-                'Parcela': format_brl,
-                'Saldo Devedor': format_brl
-            }))
+            st.dataframe(formatar_brl_df(df_sac, colunas_moeda))
 
         with col_price:
             st.subheader("Tabela Price")
-            st.dataframe(df_price.style.format({
-                'Juros': format_brl,
-                'Amortização': format_brl,
-                'Parcela': format_brl,
-                'Saldo Devedor': format_brl
-            }))
+            st.dataframe(formatar_brl_df(df_price, colunas_moeda))
 
         st.markdown("---")
         st.subheader("Análise Gráfica")
 
+        # Um único DataFrame alimenta os dois gráficos (float32 basta para o desenho e
+        # reduz pela metade os dados enviados ao navegador; os cálculos seguem em float64)
+        df_graficos = pd.DataFrame(
+            np.column_stack([
+                df_price['Parcela'].to_numpy(np.float32),
+                df_sac['Parcela'].to_numpy(np.float32),
+                df_price['Saldo Devedor'].to_numpy(np.float32),
+                df_sac['Saldo Devedor'].to_numpy(np.float32)
+            ]),
+            columns=['Parcela (Tabela Price)', 'Parcela (SAC)', 'Saldo Devedor (Tabela Price)', 'Saldo Devedor (SAC)']
+        )
+
         tab_parcela, tab_saldo = st.tabs(["Comparação de Parcelas", "Comparação do Saldo Devedor"])
 
         with tab_parcela:
-            # DataFrame para o gráfico de linhas das parcelas
-            df_grafico_parcelas = pd.DataFrame({
-                'Parcela (Tabela Price)': df_price['Parcela'],
-                'Parcela (SAC)': df_sac['Parcela']
-            })
-            st.line_chart(df_grafico_parcelas)
+            st.line_chart(df_graficos[['Parcela (Tabela Price)', 'Parcela (SAC)']])
 
         with tab_saldo:
-            # DataFrame para o gráfico de linhas do saldo devedor
-            df_grafico_saldo = pd.DataFrame({
-                'Saldo Devedor (Tabela Price)': df_price['Saldo Devedor'],
-                'Saldo Devedor (SAC)': df_sac['Saldo Devedor']
-            })
-            st.line_chart(df_grafico_saldo)
+            st.line_chart(df_graficos[['Saldo Devedor (Tabela Price)', 'Saldo Devedor (SAC)']])
             
 # -----------------------------
 # Aba 6 - Análise de Viabilidade (VPL)
@@ -834,10 +959,7 @@ elif aba == "Análise de Viabilidade (VPL)":
             
             st.markdown("---")
             st.subheader("Tabela de Fluxos de Caixa (a Valor Presente)")
-            st.dataframe(df.style.format({
-                'Fluxos de caixa previstos': format_brl,
-                'Valor presente dos fluxos de caixa': format_brl
-            }))
+            st.dataframe(formatar_brl_df(df, ['Fluxos de caixa previstos', 'Valor presente dos fluxos de caixa']))
 
             st.markdown("---")
             st.subheader("Resultados da Análise")